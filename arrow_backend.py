@@ -0,0 +1,133 @@
+import random
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pydateinfer as dateinfer
+
+MEDIA_MSGS = pa.array(['<Multimedia omitido>', '<Media omitted>'])
+SEVEN_HOURS = 60 * 60 * 7
+
+
+def create_table(dates, msgs):
+    """Returns table with cols date and msg"""
+    return pa.table({'date': pa.array(dates, pa.string()), 'msg': pa.array(msgs, pa.string())})
+
+
+def add_msg_author(table):
+    '''Adds msg author and deletes msgs without author'''
+    table = table.filter(pc.match_substring(table['msg'], ':'))
+    parts = pc.split_pattern(table['msg'], pattern=': ', max_splits=1)
+    has_author = pc.equal(pc.list_value_length(parts), 2)
+    table = table.filter(has_author)
+    flat = pc.list_flatten(parts.filter(has_author))
+    n = table.num_rows
+    author = flat.take(pa.array(np.arange(0, 2 * n, 2)))
+    msg = flat.take(pa.array(np.arange(1, 2 * n, 2)))
+    return pa.table({'date': table['date'], 'msg': msg, 'author': author})
+
+
+def add_words_by_msg(table):
+    words = pc.add(pc.cast(pc.count_substring(table['msg'], pattern=' '), pa.int64()), 1)
+    return table.append_column('words', words)
+
+
+def add_date_info(table):
+    N = table.num_rows
+    dates = table['date']
+    sample_dates = [dates[i].as_py() for i in random.sample(range(N), N if N < 50 else 50)]
+    dateformat = dateinfer.infer(sample_dates)
+    date = pc.strptime(dates, format=dateformat, unit='s')
+    table = table.set_column(table.schema.get_field_index('date'), 'date', date)
+
+    def as_int(arr):
+        return pc.cast(arr, pa.int64())
+
+    year = as_int(pc.year(date))
+    quarter = as_int(pc.quarter(date))
+    columns = dict(
+        year=year,
+        month=as_int(pc.month(date)),
+        day=as_int(pc.day(date)),
+        hour=as_int(pc.hour(date)),
+        weekofyear=as_int(pc.iso_week(date)),
+        quarter=quarter,
+        year_month=pc.strftime(date, format='%Y-%m'),
+        year_day=pc.strftime(date, format='%Y-%d'),
+        year_hour=pc.strftime(date, format='%Y-%H'),
+        year_weekofyear=pc.strftime(date, format='%Y-%V'),
+        year_quarter=pc.binary_join_element_wise(
+            pc.cast(year, pa.string()), pc.cast(quarter, pa.string()), '-'),
+        dayofweek=as_int(pc.day_of_week(date)),
+        year_dayofweek=pc.strftime(date, format='%Y-%w'),
+    )
+    for name, column in columns.items():
+        table = table.append_column(name, column)
+    return table
+
+
+def add_started_conv(table):
+    seconds = pc.cast(table['date'], pa.int64()).combine_chunks()
+    tt_prev = pc.subtract(seconds[1:], seconds[:-1])
+    starting = pc.cast(pc.greater_equal(tt_prev, SEVEN_HOURS), pa.int64())
+    starting = pa.concat_arrays([pa.array([0], pa.int64()), starting])
+    return table.append_column('starting', starting)
+
+
+def add_media_count(table):
+    media = pc.cast(pc.is_in(table['msg'], value_set=MEDIA_MSGS), pa.int64())
+    return table.append_column('media', media)
+
+
+def add_date_dimensions(table):
+    table = add_date_info(table)
+    table = add_started_conv(table)
+    return table
+
+
+def add_dimensions(table):
+    table = add_msg_author(table)
+    table = add_words_by_msg(table)
+    table = add_date_dimensions(table)
+    table = add_media_count(table)
+    return table
+
+
+def group_for_plotting(table, grouping_cols, aggregations):
+    """
+    Aggregates by grouping_cols and returns a small pandas.DataFrame indexed by them.
+    aggregations maps each output column to the (column, operation) it is computed with.
+    """
+    grouped = table.group_by(grouping_cols).aggregate(list(aggregations.values()))
+    df = grouped.to_pandas().rename(columns={f'{col}_{op}': name for name, (col, op) in aggregations.items()})
+    return df.set_index(grouping_cols)[list(aggregations)].sort_index()
+
+
+# RE2 versions of word_index.TOKEN_REGEX: letters and the emoji ranges, with skin tone modifiers
+# (U+1F3FB-1F3FF) only kept right after an emoji
+LETTERS = r'\pL\p{Nl}\p{No}'
+EMOJI = r'[\x{1F300}-\x{1F3FA}\x{1F400}-\x{1FAFF}\x{2600}-\x{27BF}][\x{1F3FB}-\x{1F3FF}]?'
+BARE_MODIFIERS = r'(^|[^\x{1F300}-\x{1F3FA}\x{1F400}-\x{1FAFF}\x{2600}-\x{27BF}])[\x{1F3FB}-\x{1F3FF}]+'
+
+
+def count_terms(table, stopwords, media_msgs):
+    """Tokenizes msg and returns the counts by author, year_month and term as a pandas.DataFrame"""
+    table = table.filter(pc.invert(pc.is_in(table['msg'], value_set=pa.array(media_msgs))))
+    msgs = pc.utf8_lower(table['msg'])
+    msgs = pc.replace_substring_regex(msgs, pattern=BARE_MODIFIERS, replacement=r'\1 ')
+    msgs = pc.replace_substring_regex(msgs, pattern=f'({EMOJI})', replacement=r' \1 ')
+    tokens = pc.split_pattern_regex(msgs, pattern=f'[^{LETTERS}\\x{{1F300}}-\\x{{1FAFF}}\\x{{2600}}-\\x{{27BF}}]+')
+
+    terms = pc.list_flatten(tokens)
+    parents = pc.list_parent_indices(tokens)
+    is_term = pc.or_(pc.match_substring_regex(terms, pattern=f'^[{LETTERS}]{{2,}}$'),
+                     pc.match_substring_regex(terms, pattern=f'^{EMOJI}$'))
+    keep = pc.and_(is_term, pc.invert(pc.is_in(terms, value_set=pa.array(sorted(stopwords), pa.string()))))
+
+    terms_table = pa.table({
+        'author': table['author'].take(parents),
+        'year_month': table['year_month'].take(parents),
+        'term': terms,
+    }).filter(keep)
+    counts = terms_table.group_by(['author', 'year_month', 'term']).aggregate([('term', 'count')])
+    df = counts.to_pandas().rename(columns={'term_count': 'count'})
+    return df[['author', 'year_month', 'term', 'count']].sort_values(['author', 'year_month', 'term'])
@@ -0,0 +1,157 @@
+// Renders the charts from the counts computed at upload time (see utils.get_aggregates_for_plotting),
+// so switching axes and options doesn't need a round trip to the server.
+
+var colors = [
+    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b',
+    '#e377c2', '#7f7f7f', '#bcbd22', '#17becf', '#03012d', '#7cf7de',
+    '#fffe7a', '#db4bda', '#aec7e8', '#ffbb78', '#98df8a', '#ff9896',
+    '#c5b0d5', '#c49c94', '#f7b6d2', '#c7c7c7', '#dbdb8d', '#bff5ff'];  // matplotlib tab20 and some others
+
+function plotTitle(filename) {
+    var words = filename.split(/\s+/).filter(function (w) { return w !== ''; });
+    var title = words.length > 3
+        ? words.slice(0, 3).concat(['<br>'], words.slice(3)).join(' ')
+        : filename;
+    return title.slice(0, -4);
+}
+
+function valueLabel(aggregates, x, value) {
+    if (x === 'month') {
+        return aggregates.labels.month[value - 1];
+    } else if (x === 'dayofweek') {
+        return aggregates.labels.dayofweek[value];
+    }
+    return String(value);
+}
+
+function yearValueLabel(aggregates, x, year, value) {
+    // same labels as the year_<dimension> columns: zero padded numbers, except for quarters
+    var label = x === 'month' || x === 'dayofweek' || x === 'quarter' || value >= 10
+        ? valueLabel(aggregates, x, value)
+        : '0' + value;
+    return year + '-' + label;
+}
+
+function compareKeys(a, b) {
+    for (var i = 0; i < a.length; i++) {
+        if (a[i] !== b[i]) {
+            return a[i] - b[i];
+        }
+    }
+    return 0;
+}
+
+// Sums the counts of a dimension into traces (columns) and categories (index), the same table
+// utils.get_df_for_plotting builds for the chosen options.
+function pivot(aggregates, x, y, groupByAuthor, groupByYear) {
+    var table = aggregates.tables[x];
+    var cells = {}, traces = {}, categories = {};
+    for (var i = 0; i < table.year.length; i++) {
+        var year = table.year[i], value = table.value[i];
+        var trace = groupByAuthor ? [table.author[i]] : [value];
+        var category = groupByAuthor ? (groupByYear ? [year, value] : [value]) : (groupByYear ? [year] : []);
+        traces[trace.join('|')] = trace;
+        categories[category.join('|')] = category;
+        var key = trace.join('|') + '/' + category.join('|');
+        var cell = cells[key] || (cells[key] = {msg: 0, words: 0, starting: 0, media: 0});
+        cell.msg += table.msg[i];
+        cell.words += table.words[i];
+        cell.starting += table.starting[i];
+        cell.media += table.media[i];
+    }
+    traces = Object.keys(traces).map(function (k) { return traces[k]; }).sort(compareKeys);
+    categories = Object.keys(categories).map(function (k) { return categories[k]; }).sort(compareKeys);
+
+    var values = categories.map(function (category) {
+        return traces.map(function (trace) {
+            var cell = cells[trace.join('|') + '/' + category.join('|')];
+            if (!cell) {
+                return 0;
+            }
+            return y === 'wpm' ? (cell.msg ? cell.words / cell.msg : 0) : cell[y];
+        });
+    });
+    return {
+        columns: traces.map(function (trace) {
+            return groupByAuthor ? aggregates.authors[trace[0]] : valueLabel(aggregates, x, trace[0]);
+        }),
+        index: categories.map(function (category) {
+            if (groupByAuthor) {
+                return groupByYear
+                    ? yearValueLabel(aggregates, x, category[0], category[1])
+                    : valueLabel(aggregates, x, category[0]);
+            }
+            return groupByYear ? String(category[0]) : aggregates.dimensions[x];
+        }),
+        values: values
+    };
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    clientside: {
+        update_metrics_dropdown: function (options, y, metricsOptions) {
+            var isNormalized = Boolean(options) && options.indexOf('normalize') !== -1;
+            var dropdownOptions = metricsOptions.map(function (o) {
+                return {label: o.label, value: o.value, disabled: isNormalized && o.value === 'wpm'};
+            });
+            var value = y && !(isNormalized && y === 'wpm') ? y : 'msg';
+            return [dropdownOptions, value];
+        },
+
+        update_graph: function (aggregates, x, y, options, filename) {
+            if (!aggregates) {
+                return [window.dash_clientside.no_update, 'd-none'];
+            }
+            options = options || [];
+            x = x || 'year';
+            y = y || 'msg';
+            var isNormalized = options.indexOf('normalize') !== -1;
+            var groupByAuthor = options.indexOf('author') !== -1;
+            var groupByYear = options.indexOf('year') !== -1 && x !== 'year';
+
+            var table = pivot(aggregates, x, y, groupByAuthor, groupByYear);
+
+            var metricName = aggregates.metrics[y].toLowerCase();
+            var metric = isNormalized
+                ? '% de l' + (y === 'words' || y === 'media' ? 'a' : 'o') + 's ' + metricName
+                : ' ' + metricName;
+            var rounding = isNormalized ? '.2f' : '.2s';
+            var hovertemplate = '%{y:' + rounding + '}' + metric + '<extra></extra>';
+
+            var data = table.columns.map(function (c, index) {
+                return {
+                    type: 'bar',
+                    x: table.index,
+                    y: table.values.map(function (row) { return row[index]; }),
+                    text: c,
+                    textposition: 'auto',
+                    hovertemplate: hovertemplate,
+                    name: c,
+                    marker: {color: groupByAuthor ? colors[index % colors.length] : '#4481e3'}
+                };
+            });
+
+            var layout = {
+                height: groupByAuthor ? 700 + (33 * Math.floor(table.columns.length / 10)) : 700,
+                showlegend: groupByAuthor,
+                hovermode: 'closest',
+                title: {
+                    text: plotTitle(filename || ''),
+                    x: 0.5,
+                    xanchor: 'center',
+                    font: {size: 30, family: 'Rockwell, monospace', color: 'black'}
+                },
+                xaxis: {type: 'category', rangeslider: {visible: false}},
+                yaxis: {color: '#7f7f7f', gridcolor: '#eaeaea'},
+                paper_bgcolor: 'white',
+                plot_bgcolor: 'white',
+                legend: {x: 0.5, y: -0.15, orientation: 'h', xanchor: 'center', font: {size: 15}},
+                hoverlabel: {bgcolor: 'white', font: {size: 16, family: 'Rockwell'}},
+                barnorm: isNormalized ? 'percent' : ''
+            };
+
+            var hintClassName = groupByAuthor ? 'text-center mx-auto' : 'd-none';
+            return [{data: data, layout: layout}, hintClassName];
+        }
+    }
+});
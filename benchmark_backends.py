@@ -0,0 +1,50 @@
+'''
+Compares the pandas and arrow backends on the same chat exports,
+checking both produce the same plotting tables.
+Without arguments it uses synthetic chats of several sizes, in 24 and 12 hour formats.
+
+Usage: python benchmark_backends.py [chat.txt other_chat.txt ...]
+'''
+import sys
+import time
+import warnings
+
+from utils import get_df_from_content, get_aggregates_for_plotting
+from loadtest import synthetic_chat
+
+BACKENDS = ['pandas', 'arrow']
+REPEATS = 3
+SYNTHETIC_SIZES = [1000, 10000, 50000]
+
+
+def best_of(func, repeats=REPEATS):
+    best, result = None, None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmark(name, content):
+    aggregates = {}
+    for backend in BACKENDS:
+        parse_time, df = best_of(lambda: get_df_from_content(content, backend=backend))
+        agg_time, aggregates[backend] = best_of(lambda: get_aggregates_for_plotting(df))
+        print(f'{name:<40} {backend:<8} {len(df):>9} {parse_time:>10.3f} {agg_time:>10.3f}')
+    assert aggregates['pandas'] == aggregates['arrow'], f'{name}: backends disagree on the plotting tables'
+
+
+if __name__ == '__main__':
+    warnings.simplefilter('ignore')
+    print(f"{'chat':<40} {'backend':<8} {'msgs':>9} {'parse (s)':>10} {'aggs (s)':>10}")
+    if sys.argv[1:]:
+        for filename in sys.argv[1:]:
+            with open(filename) as file:
+                benchmark(filename, file.read())
+    else:
+        for size in SYNTHETIC_SIZES:
+            for twelve_hour in (False, True):
+                name = f"synthetic {size} msgs, {'12' if twelve_hour else '24'}h"
+                benchmark(name, synthetic_chat(size, seed=size, twelve_hour=twelve_hour))
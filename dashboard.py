@@ -3,7 +3,7 @@ import logging
 import base64
 import uuid
 import dash
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output, State, ClientsideFunction
 import dash_core_components as dcc
 import dash_html_components as html
 import dash_component_unload as dcu
@@ -11,9 +11,9 @@ import dash_bootstrap_components as dbc
 from dash.exceptions import PreventUpdate
 
 import plotly.graph_objects as go
-import pandas as pd
 
-from utils import get_df_from_content, get_df_for_plotting, showable_dimensions_dict, metrics_dict
+from utils import get_df_from_content, get_aggregates_for_plotting, showable_dimensions_dict, metrics_dict
+from word_index import build_word_counts, build_top_words, save_top_words, load_top_words, get_top_words
 
 
 logging.basicConfig(
@@ -22,12 +22,6 @@ logger = logging.getLogger(__name__)
 TEN_MB = 1024 * 1024 * 10
 CURR_DIR = os.path.dirname(os.path.realpath(__file__))
 
-colors = [
-    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b',
-    '#e377c2', '#7f7f7f', '#bcbd22', '#17becf', '#03012d', '#7cf7de',
-    '#fffe7a', '#db4bda', '#aec7e8', '#ffbb78', '#98df8a', '#ff9896',
-    '#c5b0d5', '#c49c94', '#f7b6d2', '#c7c7c7', '#dbdb8d', '#bff5ff']  # matplotlib tab20 and some others
-
 # Loading screen CSS
 external_stylesheets = [dbc.themes.BOOTSTRAP,
                         "https://codepen.io/chriddyp/pen/brPBPO.css"]
@@ -52,6 +46,44 @@ meta_tags = [{'charset': 'utf-8'},
               'content': 'https://cdn.icon-icons.com/icons2/550/PNG/512/business-color_board-30_icon-icons.com_53475.png'},
              {'property': 'og:image:type', 'content': 'image/png'}]
 
+
+def dims_dropdown(value=None):
+    return dcc.Dropdown(
+        id='xaxis-columns',
+        options=[{'label': v, 'value': k}
+                 for k, v in showable_dimensions_dict.items()],
+        placeholder='Eje x',
+        value=value if value else 'year',
+        clearable=False
+    )
+
+
+def metrics_dropdown(value=None):
+    # 'Palabras por mensaje' gets disabled in the browser while showing percentages
+    return dcc.Dropdown(
+        id='yaxis-columns',
+        options=[{'label': v, 'value': k}
+                 for k, v in metrics_dict.items()],
+        placeholder='Eje y',
+        value=value if value else 'msg',
+        clearable=False
+    )
+
+
+def optionals_dropdown(value=None):
+    return dcc.Dropdown(
+        id='optionals_dropdown',
+        options=[
+            {'label': 'Agrupar por autor/a', 'value': 'author'},
+            {'label': u'Agrupar por año', 'value': 'year'},
+            {'label': 'Ver en porcentajes', 'value': 'normalize'}
+        ],
+        multi=True,
+        value=[] if not value else value,
+        placeholder='Opciones'
+    )
+
+
 app = dash.Dash(__name__,
                 external_stylesheets=external_stylesheets,
                 meta_tags=meta_tags)
@@ -94,14 +126,18 @@ app.layout = html.Div(
                             max_size=TEN_MB,
                             accept='.txt',
                             className_reject='reject'
-                        )
+                        ),
+                        dcc.Store(id='aggregates')
                     ]
                 ),
                 html.Div(id='error_parsing')]),
         html.Hr(),
         dcc.Store(id='session-id', storage_type='session'),
         dcc.Store(id='curr_filename', storage_type='session'),
+        dcc.Store(id='upload-token'),
         html.Div(
+            id='dashboard',
+            className='d-none',
             children=[
                 html.Div(
                     className='row mx-auto',
@@ -109,16 +145,12 @@ app.layout = html.Div(
                         html.Div(
                             id='xaxis-columns-wrapper',
                             className='col-xl-3 offset-xl-3 col-md-5 offset-md-1 col-sm-6 mb-3',
-                            children=[dcc.Dropdown(
-                                id='xaxis-columns',
-                                className='d-none')],
+                            children=[dims_dropdown()],
                         ),
                         html.Div(
                             id='yaxis-columns-wrapper',
                             className='col-xl-3 col-md-5 col-sm-6 mb-3',
-                            children=[dcc.Dropdown(
-                                id='yaxis-columns',
-                                className='d-none')],
+                            children=[metrics_dropdown()],
                         )]),
                 html.Div(
                     className='row mx-auto',
@@ -126,19 +158,55 @@ app.layout = html.Div(
                         html.Div(
                             id='optionals_dropdown_wrapper',
                             className='col-md-6 mb-3  mx-auto',
-                            children=[
-                                dcc.Dropdown(
-                                    id='optionals_dropdown',
-                                    className='d-none'
-                                )
-                            ]
+                            children=[optionals_dropdown()]
                         )
                     ]
                 ),
-                dbc.Spinner(id="loading",
-                            spinner_style={"width": "8rem", "height": "8rem"},
-                            color='primary',
-                            children=html.Div(id='graph')),
+                html.Div(
+                    id='graph',
+                    className='mx-3',
+                    children=[
+                        dcc.Graph(id='whatsapp-info'),
+                        html.Div(
+                            id='author_filter_hint',
+                            children=[
+                                'Podés filtrar por autor/a! ',
+                                dbc.Tooltip(
+                                    children='Haciendo click en cada uno de los nombres podés agregarlos o quitarlos. Haciendo doble click en uno, podés quedarte únicamente con ese.',
+                                    target='author_filter_instructions',
+                                ),
+                                html.Sup(id='author_filter_instructions', children='(?)')],
+                            className='d-none',
+                            style={'fontSize': 25}
+                        ),
+                        html.Br(),
+                        html.Br(),
+                        html.Br(),
+                    ]
+                ),
+                html.Div(
+                    id='top-words',
+                    className='mx-3',
+                    children=[
+                        html.Div(
+                            className='row mx-auto',
+                            children=[
+                                html.Div(
+                                    className='col-xl-3 offset-xl-3 col-md-5 offset-md-1 col-sm-6 mb-3',
+                                    children=[dcc.Dropdown(
+                                        id='words-author',
+                                        placeholder='Todos/as')],
+                                ),
+                                html.Div(
+                                    className='col-xl-3 col-md-5 col-sm-6 mb-3',
+                                    children=[dcc.Dropdown(
+                                        id='words-period',
+                                        placeholder='Todo el chat')],
+                                )]),
+                        dcc.Graph(id='top-words-graph'),
+                        html.Br(),
+                    ]
+                ),
             ]
         ),
         html.Div(id='page-listener-dummy'),
@@ -161,14 +229,15 @@ def parse_contents(contents):
     Output('session-id', 'data'),
     Output('curr_filename', 'data'),
     Output('instructions', 'children'),
-    Output('loading', 'children'),
+    Output('aggregates', 'data'),
+    Output('upload-token', 'data'),
+    Output('dashboard', 'className'),
     Output('error_parsing', 'children')],
     [Input('datatable-upload', 'contents')],
     [State('datatable-upload', 'filename'),
      State('session-id', 'data')]
 )
 def update_output(contents, new_filename, sessionid):
-    graph = html.Div(id='graph')
     if contents is None:
         sessionid = None
         filename = None
@@ -178,7 +247,7 @@ def update_output(contents, new_filename, sessionid):
                                       target="_blank"))]
         error = None
 
-        return sessionid, filename, instructions, graph, error
+        return sessionid, filename, instructions, None, None, 'd-none', error
 
     df = parse_contents(contents)
     if df is None:
@@ -186,62 +255,93 @@ def update_output(contents, new_filename, sessionid):
                                    u'Ocurrió un error! Por favor intentá de nuevo. Si el error persiste, contactate a ',
                                    html.A('iganre@gmail.com', href='mailto:iganre@gmail.com')],
                          style={'textAlign': 'center', 'fontSize': 30})
-        return sessionid, None, None, graph, error
+        return sessionid, None, None, None, None, 'd-none', error
 
     sessionid = str(uuid.uuid4()) if not sessionid else sessionid
 
-    file_location = os.path.join(CURR_DIR, 'cache', f'{sessionid}.feather')
-    df.reset_index().to_feather(file_location)
+    aggregates = dict(metrics=metrics_dict, dimensions=showable_dimensions_dict, **get_aggregates_for_plotting(df))
+
+    words_location = os.path.join(CURR_DIR, 'cache', f'{sessionid}.words.json')
+    save_top_words(build_top_words(build_word_counts(df)), words_location)
 
     instructions = u'Si querés cambiar de conversación podés subir otra!'
     error = None
     return (sessionid,
             new_filename,
             instructions,
-            graph,
+            aggregates,
+            str(uuid.uuid4()),
+            '',
             error)
 
 
-def plot(df, hue, y, should_group_by_author, should_group_by_year, is_normalized, filename):
-    global colors
-    if not y:
-        y = 'msg'
-    metric = f' {metrics_dict[y].lower()}' if not is_normalized else f"% de l{'a' if 'words' == y or 'media' == y else 'o'}s {metrics_dict[y].lower()}"
-    rounding = '.2f' if is_normalized else '.2s'
-    hovertemplate = f'%{{y:{rounding}}}{metric}<extra></extra>'
-
-    if should_group_by_author:
-        x = 'author'
-        if should_group_by_year:
-            hue = f'year_{hue}' if hue else 'year'
-        plotting_df = get_df_for_plotting(df=df, x=x, y=y, hue=hue)
-    else:
-        x = hue if hue else 'year'
-        if should_group_by_year:
-            hue = 'year'
-        else:
-            hue = None
-        plotting_df = get_df_for_plotting(df=df, x=x, y=y, hue=hue)
+app.clientside_callback(
+    ClientsideFunction(namespace='clientside', function_name='update_metrics_dropdown'),
+    [Output('yaxis-columns', 'options'),
+     Output('yaxis-columns', 'value')],
+    [Input('optionals_dropdown', 'value')],
+    [State('yaxis-columns', 'value'),
+     State('yaxis-columns', 'options')]
+)
 
-    data = [go.Bar(
-        x=plotting_df.index,
-        y=plotting_df[c].values,
-        text=c,
-        textposition='auto',
-        hovertemplate=hovertemplate,
-        name=c,
-        marker_color=colors[index % len(colors)] if should_group_by_author else '#4481e3'
-    )
-        for index, c in enumerate(plotting_df.columns)]
 
+app.clientside_callback(
+    ClientsideFunction(namespace='clientside', function_name='update_graph'),
+    [Output('whatsapp-info', 'figure'),
+     Output('author_filter_hint', 'className')],
+    [Input('aggregates', 'data'),
+     Input('xaxis-columns', 'value'),
+     Input('yaxis-columns', 'value'),
+     Input('optionals_dropdown', 'value')],
+    [State('curr_filename', 'data')]
+)
+
+
+@app.callback(
+    [Output('words-author', 'options'),
+     Output('words-author', 'value'),
+     Output('words-period', 'options'),
+     Output('words-period', 'value')],
+    [Input('upload-token', 'data')],
+    [State('session-id', 'data')]
+)
+def update_words_options(upload_token, sessionid):
+    if not upload_token:
+        raise PreventUpdate
+    words_location = os.path.join(CURR_DIR, 'cache', f'{sessionid}.words.json')
+    if not os.path.isfile(words_location):
+        raise PreventUpdate
+    top_words = load_top_words(words_location)
+    authors_options = [{'label': a, 'value': a} for a in top_words['authors']]
+    return authors_options, None, top_words['periods'], None
+
+
+@app.callback(
+    Output('top-words-graph', 'figure'),
+    [Input('upload-token', 'data'),
+     Input('words-author', 'value'),
+     Input('words-period', 'value')],
+    [State('session-id', 'data')]
+)
+def update_top_words(upload_token, author, period, sessionid):
+    if not upload_token:
+        raise PreventUpdate
+    words_location = os.path.join(CURR_DIR, 'cache', f'{sessionid}.words.json')
+    if not os.path.isfile(words_location):
+        raise PreventUpdate
+    top_words = get_top_words(load_top_words(words_location), author=author, period=period)[::-1]
+
+    data = [go.Bar(
+        x=top_words.values,
+        y=top_words.index,
+        orientation='h',
+        hovertemplate='%{x} veces<extra></extra>',
+        marker_color='#4481e3'
+    )]
     layout = dict(
-        height=700 if not should_group_by_author else 700 + (33 * (len(set(plotting_df.columns)) // 10)),
-        showlegend=x == 'author',
-        hovermode='closest',
+        height=700,
         title=dict(
-            text=(' '.join(filename.split()[:3] + ['<br>'] + filename.split()[3:])
-                  if len(filename.split()) > 3
-                  else filename)[:-4],
+            text=u'Palabras más usadas',
             x=0.5,
             xanchor='center',
             font=dict(
@@ -250,134 +350,24 @@ def plot(df, hue, y, should_group_by_author, should_group_by_year, is_normalized
                 color='black',
             )
         ),
-        xaxis=dict(
-            type='category',
-            rangeslider=dict(
-                visible=False
-            )
-        ),
         yaxis=dict(
+            type='category'
+        ),
+        xaxis=dict(
             color='#7f7f7f',
             gridcolor='#eaeaea'
         ),
         paper_bgcolor='white',
         plot_bgcolor='white',
-        legend=dict(
-            x=0.5,
-            y=-0.15,
-            orientation='h',
-            xanchor='center',
-            font=dict(
-                size=15
-            )
-        ),
         hoverlabel=dict(
             bgcolor='white',
             font=dict(
                 size=16,
                 family='Rockwell'
             )
-        ),
-        barnorm='percent' if is_normalized else None
-    )
-
-    figure = go.Figure(data=data, layout=layout)
-
-    return html.Div(
-        className='mx-3',
-        children=[
-            dcc.Graph(
-                id='whatsapp-info',
-                figure=figure
-            ),
-            html.Div(
-                children=[
-                    'Podés filtrar por autor/a! ',
-                    dbc.Tooltip(
-                        children='Haciendo click en cada uno de los nombres podés agregarlos o quitarlos. Haciendo doble click en uno, podés quedarte únicamente con ese.',
-                        target='author_filter_instructions',
-                    ),
-                    html.Sup(id='author_filter_instructions', children='(?)')] if should_group_by_author else '',
-                className='text-center mx-auto',
-                style={'fontSize': 25}
-            ),
-            html.Br(),
-            html.Br(),
-            html.Br(),
-        ]
-    )
-
-
-def dims_dropdown(value):
-    return dcc.Dropdown(
-        id='xaxis-columns',
-        options=[{'label': v, 'value': k}
-                 for k, v in showable_dimensions_dict.items()],
-        placeholder='Eje x',
-        value=value if value else 'year',
-        clearable=False
-    )
-
-
-def metrics_dropdown(value, is_normalized):
-    return dcc.Dropdown(
-        id='yaxis-columns',
-        options=[{'label': v, 'value': k, 'disabled': is_normalized and k == 'wpm'}
-                 for k, v in metrics_dict.items()],
-        placeholder='Eje y',
-        value=value if value and not (is_normalized and value == 'wpm') else 'msg',
-        clearable=False
+        )
     )
-
-
-def optionals_dropdown(value):
-    return html.Div([
-        dcc.Dropdown(
-            id='optionals_dropdown',
-            options=[
-                {'label': 'Agrupar por autor/a', 'value': 'author'},
-                {'label': u'Agrupar por año', 'value': 'year'},
-                {'label': 'Ver en porcentajes', 'value': 'normalize'}
-            ],
-            multi=True,
-            value=[] if not value else value,
-            placeholder='Opciones'
-        )]
-    )
-
-
-@app.callback(
-    [Output('graph', 'children'),
-     Output('xaxis-columns-wrapper', 'children'),
-     Output('yaxis-columns-wrapper', 'children'),
-     Output('optionals_dropdown_wrapper', 'children')],
-    [Input('session-id', 'data'),
-     Input('xaxis-columns', 'value'),
-     Input('yaxis-columns', 'value'),
-     Input('optionals_dropdown', 'value')],
-    [State('curr_filename', 'data'),
-     State('error_parsing', 'children')]
-)
-def update_graph(sessionid, x, y, options, filename, error):
-    if not sessionid:
-        raise PreventUpdate
-    elif error is not None:
-        return None, None, None, None, None, None
-    else:
-        normalize_bars = options is not None and 'normalize' in options
-        group_by_author = options is not None and 'author' in options
-        group_by_year = options is not None and 'year' in options and x != 'year'
-
-        file_location = os.path.join(CURR_DIR, 'cache', f'{sessionid}.feather')
-        dff = pd.read_feather(file_location).drop('index', axis=1)
-        x_dropdown = html.Div(dims_dropdown(x))
-        y_dropdown = html.Div(metrics_dropdown(y, normalize_bars))
-        opts_dropdown = optionals_dropdown(options)
-
-        y_col = y_dropdown.children.value
-        figure = plot(dff, x, y_col, group_by_author, group_by_year, normalize_bars, filename)
-
-        return figure, x_dropdown, y_dropdown, opts_dropdown
+    return go.Figure(data=data, layout=layout)
 
 
 @app.callback(
@@ -387,7 +377,7 @@ def update_graph(sessionid, x, y, options, filename, error):
 def delete_cache(close, sessionid):
     if not close:
         raise PreventUpdate
-    file_location = os.path.join(CURR_DIR, 'cache', f'{sessionid}.feather')
+    file_location = os.path.join(CURR_DIR, 'cache', f'{sessionid}.words.json')
     if os.path.isfile(file_location):
         os.remove(file_location)
     return None
@@ -0,0 +1,258 @@
+'''
+Load tests the dashboard with concurrent simulated sessions.
+
+Starts dashboard:server under gunicorn (unless --url is given) and replays sessions
+against the Dash callback endpoint: an upload of a synthetic chat, a burst of
+top words filters and the unload that deletes the session cache.
+
+Usage: python loadtest.py --workers 2 --concurrency 8 --sessions 40 --sizes 1000,10000,50000
+'''
+import os
+import sys
+import math
+import time
+import socket
+import base64
+import random
+import argparse
+import threading
+import subprocess
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from utils import get_df_from_content
+
+CURR_DIR = os.path.dirname(os.path.realpath(__file__))
+CACHE_DIR = os.path.join(CURR_DIR, 'cache')
+
+AUTHORS = ['Ana', 'Bruno', 'Carla', 'Diego', 'Eva', 'Facundo', 'Gabi', 'Hernán']
+SPAN = timedelta(days=540)  # every chat covers the same period, whatever its size
+WORDS = ('hola que tal como andas bien todo el dia de hoy la casa perro gato '
+         'jaja mañana vamos al cine nos vemos dale listo 😂 ❤').split()
+
+
+def synthetic_chat(n_msgs, seed=0, twelve_hour=False):
+    """Returns a chat export with n_msgs messages in the format WhatsApp uses in spanish"""
+    rnd = random.Random(seed)
+    authors = AUTHORS[:rnd.randint(2, len(AUTHORS))]
+    date = datetime(2018, 1, 1)
+    mean_gap = SPAN.total_seconds() / n_msgs
+    lines = []
+    for _ in range(n_msgs):
+        date += timedelta(seconds=rnd.uniform(0, 2 * mean_gap))
+        if rnd.random() < 0.05:
+            msg = '<Multimedia omitido>'
+        else:
+            msg = ' '.join(rnd.choices(WORDS, k=rnd.randint(1, 15)))
+        if twelve_hour:
+            hour = f"{date.hour % 12 or 12}:{date:%M} {'p. m.' if date.hour >= 12 else 'a. m.'}"
+        else:
+            hour = f'{date.hour}:{date:%M}'
+        lines.append(f'{date.day}/{date.month}/{date:%y} {hour} - {rnd.choice(authors)}: {msg}')
+    return '\n'.join(lines)
+
+
+def dash_payload(outputs, inputs, state=(), changed=None):
+    """Builds the body Dash expects in /_dash-update-component, changed defaults to the first input"""
+    def prop(id_prop, value=None):
+        component_id, component_property = id_prop.rsplit('.', 1)
+        return {'id': component_id, 'property': component_property, 'value': value}
+
+    multi = len(outputs) > 1
+    return {
+        'output': f"..{'...'.join(outputs)}.." if multi else outputs[0],
+        'outputs': [prop(o) for o in outputs] if multi else prop(outputs[0]),
+        'inputs': [prop(*i) for i in inputs],
+        'state': [prop(*s) for s in state],
+        'changedPropIds': [changed or inputs[0][0]],
+    }
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def run_session(url, content, clicks, results, lock, seed):
+    rnd = random.Random(seed)
+    session = requests.Session()
+
+    def call(name, outputs, inputs, state=(), changed=None, is_ok=lambda body: True):
+        start = time.perf_counter()
+        try:
+            r = session.post(f'{url}/_dash-update-component', json=dash_payload(outputs, inputs, state, changed),
+                             timeout=300)
+            body = r.json()['response'] if r.status_code == 200 else {}
+            ok = r.status_code in (200, 204) and is_ok(body)
+        except Exception:  # connection errors, non JSON bodies or unexpected responses
+            ok, body = False, {}
+        elapsed = time.perf_counter() - start
+        with lock:
+            results.setdefault(name, []).append((elapsed, ok))
+        return body if ok else None
+
+    upload = call('update_output',
+                  ['session-id.data', 'curr_filename.data', 'instructions.children',
+                   'aggregates.data', 'upload-token.data', 'dashboard.className', 'error_parsing.children'],
+                  [('datatable-upload.contents', content)],
+                  [('datatable-upload.filename', 'Chat de WhatsApp con Grupo.txt'), ('session-id.data', None)],
+                  is_ok=lambda body: body['error_parsing']['children'] is None)
+    if not upload:
+        return
+    sessionid = upload['session-id']['data']
+    upload_token = upload['upload-token']['data']
+
+    options = call('update_words_options',
+                   ['words-author.options', 'words-author.value', 'words-period.options', 'words-period.value'],
+                   [('upload-token.data', upload_token)],
+                   [('session-id.data', sessionid)])
+    authors = [None] + [o['value'] for o in options['words-author']['options']] if options else [None]
+    periods = [None] + [o['value'] for o in options['words-period']['options']] if options else [None]
+
+    for _ in range(clicks):
+        call('update_top_words',
+             ['top-words-graph.figure'],
+             [('upload-token.data', upload_token),
+              ('words-author.value', rnd.choice(authors)),
+              ('words-period.value', rnd.choice(periods))],
+             [('session-id.data', sessionid)],
+             changed=rnd.choice(['words-author.value', 'words-period.value']))
+
+    call('delete_cache',
+         ['page-listener-dummy.children'],
+         [('page-listener.close', True)],
+         [('session-id.data', sessionid)])
+
+
+def children_pids(pid):
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                ppid = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            pids.append(int(entry))
+    return pids
+
+
+def rss_bytes(pid):
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def cache_bytes():
+    total = 0
+    for f in os.listdir(CACHE_DIR):
+        try:
+            total += os.path.getsize(os.path.join(CACHE_DIR, f))
+        except OSError:  # deleted by a session while listing
+            pass
+    return total
+
+
+def monitor(master_pid, samples, stop, interval=0.5):
+    while not stop.is_set():
+        workers = children_pids(master_pid) if master_pid else []
+        samples.append((sum(rss_bytes(pid) for pid in workers), max([rss_bytes(pid) for pid in workers] or [0]),
+                        cache_bytes()))
+        stop.wait(interval)
+
+
+def start_gunicorn(port, workers, timeout):
+    with socket.socket() as sock:  # otherwise another server could answer while gunicorn retries binding
+        if sock.connect_ex(('127.0.0.1', port)) == 0:
+            sys.exit(f'port {port} is already in use, choose another one with --port')
+    server = subprocess.Popen(
+        ['gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}', '--timeout', str(timeout), 'dashboard:server'],
+        cwd=CURR_DIR)
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(120):
+        if server.poll() is not None:
+            break
+        try:
+            if requests.get(url, timeout=1).status_code == 200 and server.poll() is None:
+                return server, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    sys.exit('gunicorn did not start')
+
+
+def report(results, elapsed, samples, cache_before):
+    mb = 1024 * 1024
+    total = sum(len(r) for r in results.values())
+    print(f"\n{'callback':<22} {'calls':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, calls in results.items():
+        times = [t * 1000 for t, _ in calls]
+        errors = sum(not ok for _, ok in calls)
+        print(f'{name:<22} {len(calls):>6} {errors:>6} {percentile(times, 50):>8.0f} '
+              f'{percentile(times, 95):>8.0f} {percentile(times, 99):>8.0f}')
+    print(f'\nthroughput: {total / elapsed:.1f} req/s ({total} requests in {elapsed:.1f}s)')
+    if samples and samples[-1][0]:
+        print(f'workers RSS: peak total {max(s[0] for s in samples) / mb:.0f} MB, '
+              f'peak per worker {max(s[1] for s in samples) / mb:.0f} MB, '
+              f'final total {samples[-1][0] / mb:.0f} MB')
+    if samples:
+        print(f'cache dir: {cache_before / mb:.1f} MB before, peak {max(s[2] for s in samples) / mb:.1f} MB, '
+              f'{cache_bytes() / mb:.1f} MB after')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the dashboard with simulated sessions.')
+    parser.add_argument('--url', help='Test an already running server instead of starting gunicorn')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--timeout', type=int, default=30, help='gunicorn worker timeout')
+    parser.add_argument('--concurrency', type=int, default=4, help='Sessions running at the same time')
+    parser.add_argument('--sessions', type=int, default=20, help='Total sessions to run')
+    parser.add_argument('--sizes', default='1000,10000,50000', help='Messages per synthetic chat, comma separated')
+    parser.add_argument('--clicks', type=int, default=10, help='Filter changes per session')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    chats = [synthetic_chat(size, seed=size) for size in sizes]
+    for size, chat in zip(sizes, chats):
+        try:
+            get_df_from_content(chat)
+        except Exception as e:
+            sys.exit(f'The synthetic chat with {size} messages does not parse: {e}')
+    contents = ['data:text/plain;base64,' + base64.b64encode(chat.encode()).decode() for chat in chats]
+
+    server, url = (None, args.url) if args.url else start_gunicorn(args.port, args.workers, args.timeout)
+    results, lock = {}, threading.Lock()
+    samples, stop = [], threading.Event()
+    cache_before = cache_bytes()
+    sampler = threading.Thread(target=monitor, args=(server.pid if server else None, samples, stop))
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            sessions = [pool.submit(run_session, url, contents[i % len(contents)], args.clicks, results, lock, i)
+                        for i in range(args.sessions)]
+            for session in sessions:
+                session.result()
+        elapsed = time.perf_counter() - start
+    finally:
+        stop.set()
+        sampler.join()
+        if server:
+            server.terminate()
+            server.wait()
+    report(results, elapsed, samples, cache_before)
+
+
+if __name__ == '__main__':
+    main()
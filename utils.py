@@ -1,12 +1,20 @@
+import os
 import re
 import locale
 import calendar
 import random
 import pandas as pd
+import pyarrow as pa
 import pydateinfer as dateinfer
 
+import arrow_backend
+
 pd.options.mode.chained_assignment = None
 
+# 'pandas' or 'arrow'. The arrow backend keeps the chat in a pyarrow.Table
+# and only builds pandas dataframes for the (small) plotting tables.
+BACKEND = os.getenv('WHATSTAT_BACKEND', 'pandas')
+
 showable_dimensions_dict = dict(
     year=u'Año',
     month='Mes',
@@ -78,8 +86,8 @@ def clean_datetime_string(dts):
     return date
 
 
-def create_df(stripped_data):
-    """Returns df with cols date and msg"""
+def split_lines(stripped_data):
+    """Returns dates and msgs lists from the lines that start a message"""
     start_regex = r"^\d{1,4}[\/-]\d{1,2}[\/-]\d{1,4} \d{1,2}:\d{1,2}"  # regex to split only strings like date time
     dates = []
     msgs = []
@@ -95,6 +103,12 @@ def create_df(stripped_data):
                 dates.append(date)
                 msg = line_splitted[1]
                 msgs.append(msg)
+    return dates, msgs
+
+
+def create_df(stripped_data):
+    """Returns df with cols date and msg"""
+    dates, msgs = split_lines(stripped_data)
     df = pd.DataFrame({'date': dates, 'msg': msgs})
     return df
 
@@ -154,6 +168,8 @@ def add_date_dimensions(df):
 
 
 def add_dimensions(df):
+    if isinstance(df, pa.Table):
+        return arrow_backend.add_dimensions(df)
     df = add_msg_author(df)
     df = add_words_by_msg(df)
     df = add_date_dimensions(df)
@@ -166,14 +182,26 @@ def get_df_from_filename(filename):
     return add_dimensions(df)
 
 
-def get_df_from_content(content):
+def get_df_from_content(content, backend=None):
+    backend = backend or BACKEND
+    if backend == 'arrow':
+        table = arrow_backend.create_table(*split_lines(read_stringio(content)))
+        return add_dimensions(table)
+    elif backend != 'pandas':
+        raise ValueError(f'Unknown backend {backend}')
     df = create_df(read_stringio(content))
     return add_dimensions(df).drop(columns=['index'])
 
 
-def put_locale_names(df, x, hue=None):
+def get_locale_names():
+    """Returns capitalized day (monday first) and month names for the current locale"""
     day_names = list(map(lambda name: name.capitalize(), filter(lambda name: name != '', calendar.day_name)))
     month_names = list(map(lambda name: name.capitalize(), filter(lambda name: name != '', calendar.month_name)))
+    return day_names, month_names
+
+
+def put_locale_names(df, x, hue=None):
+    day_names, month_names = get_locale_names()
     if hue:
         if hue == 'dayofweek':
             df = df.set_index(pd.Series([day_names[dow] for dow in df.index]))
@@ -216,14 +244,38 @@ def put_locale_names(df, x, hue=None):
     return df
 
 
+def group_for_plotting(df, grouping_cols, metrics):
+    """Aggregates every metric in metrics by grouping_cols with a single group by"""
+    aggregations = {y: ('words' if y == 'wpm' else y, metric_agg_op[y]) for y in metrics}
+    if isinstance(df, pa.Table):
+        return arrow_backend.group_for_plotting(df, grouping_cols, aggregations)
+    return df.groupby(grouping_cols).agg(**aggregations)
+
+
+def pivot_for_plotting(df, x, y, hue=None):
+    """Turns the y column of a group_for_plotting result into the table plotted for x and hue"""
+    new_cols = sorted(list(set(df.index.get_level_values(x))))
+    new_index = sorted(list(set(df.index.get_level_values(hue)))) if hue else list(range(1))
+
+    if hue:
+        trans_df = df[y].unstack(level=0).reindex(index=new_index, columns=new_cols)
+    else:
+        trans_df = df[[y]].T.reindex(columns=new_cols)
+        trans_df.index = [dimensions_dict[x]]
+
+    trans_df = put_locale_names(trans_df, x, hue)
+
+    return trans_df.fillna(0)
+
+
 def get_df_for_plotting(df, x, y, hue=None, l='es_ES'):
     """
   Functionality to transform dataframe into plotly required format.
 
   Parameters
   ----------
-      df : pandas.DataFrame
-          Base dataframe. It can be grouped.
+      df : pandas.DataFrame or pyarrow.Table
+          Base dataframe. It can be grouped. Tables are aggregated with pyarrow.
       x : str
           Column that will represent x axis in the plot
       y : str
@@ -235,8 +287,8 @@ def get_df_for_plotting(df, x, y, hue=None, l='es_ES'):
   -------
       pandas.DataFrame: the transformed df ready to be plotted
     """
-    if not isinstance(df, pd.DataFrame):
-        raise ValueError('df should be a valid pandas.DataFrame')
+    if not isinstance(df, (pd.DataFrame, pa.Table)):
+        raise ValueError('df should be a valid pandas.DataFrame or pyarrow.Table')
     if not x or not isinstance(x, str):
         raise ValueError('x value should be a column present in the dataframe')
     if not y or not isinstance(y, str):
@@ -244,36 +296,55 @@ def get_df_for_plotting(df, x, y, hue=None, l='es_ES'):
 
     locale.setlocale(locale.LC_ALL, l)
 
-    if y in metric_agg_op:
-        agg_op = metric_agg_op[y]
-    else:
+    if y not in metric_agg_op:
         raise ValueError('This metric is not supported yet')
 
-    y = 'words' if y == 'wpm' else y
+    grouping_cols = [x] if not hue else [x, hue]
+    grouped = group_for_plotting(df, grouping_cols, [y])
 
-    df = df.copy()
-    cols = [x, y] if not hue else [x, hue, y]
-    df = df.reset_index()[cols]
+    return pivot_for_plotting(grouped, x, y, hue)
 
-    new_cols = sorted(list(set(df[x])))
-    new_index = sorted(list(set(df[hue]))) if hue else list(range(1))
-    grouping_cols = cols.copy()
-    grouping_cols.remove(y)
 
-    df = df.groupby(grouping_cols)
-    agg = getattr(df, agg_op)
-    df = agg()
-
-    trans_df = pd.DataFrame(columns=new_cols, index=new_index)
-
-    if hue:
-        for idx in df.index:
-            trans_df.at[idx[1], idx[0]] = df.loc[idx][y]
-    else:
-        for idx in df.index:
-            trans_df.at[0, idx] = df.loc[idx][y]
-        trans_df.index = [dimensions_dict[x]]
+def get_aggregates_for_plotting(df, l='es_ES'):
+    """
+  Counts the metrics by author, year and each dimension, which is all the browser
+  needs to regroup and pivot every chart the dashboard can show.
 
-    trans_df = put_locale_names(trans_df, x, hue)
+  Parameters
+  ----------
+      df : pandas.DataFrame or pyarrow.Table
+          Dataframe returned by get_df_from_content.
+      l : str
+          Locale used for month and day names.
 
-    return trans_df.fillna(0)
+  Returns
+  -------
+      dict: sorted authors, month and day names and, for each dimension, a table with
+      author (position in authors), year, value, msg, words, starting and media lists
+      so it can be shipped to the browser
+    """
+    locale.setlocale(locale.LC_ALL, l)
+    day_names, month_names = get_locale_names()
+    counts = [metric for metric in metrics_dict if metric != 'wpm']
+
+    tables = {}
+    for dim in showable_dimensions_dict:
+        grouping_cols = ['author', 'year'] if dim == 'year' else ['author', 'year', dim]
+        tables[dim] = group_for_plotting(df, grouping_cols, counts).reset_index()
+
+    authors = sorted(set(tables['year'].author))
+    author_codes = {author: code for code, author in enumerate(authors)}
+    for dim, grouped in tables.items():
+        table = dict(
+            author=grouped.author.map(author_codes).tolist(),
+            year=grouped.year.tolist(),
+            value=grouped[dim].tolist()
+        )
+        table.update({metric: grouped[metric].tolist() for metric in counts})
+        tables[dim] = table
+
+    return dict(
+        authors=authors,
+        labels=dict(month=month_names, dayofweek=day_names),
+        tables=tables
+    )
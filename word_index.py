@@ -0,0 +1,151 @@
+import os
+import json
+import locale
+import pandas as pd
+import pyarrow as pa
+
+import arrow_backend
+from utils import get_locale_names
+
+CURR_DIR = os.path.dirname(os.path.realpath(__file__))
+
+# words (letters only, 2+ chars) or single emojis, keeping skin tone modifiers (U+1F3FB-1F3FF) attached.
+# arrow_backend.count_terms tokenizes the same way with RE2 patterns.
+TOKEN_REGEX = r'[^\W\d_]{2,}|[\U0001F300-\U0001F3FA\U0001F400-\U0001FAFF\u2600-\u27BF][\U0001F3FB-\U0001F3FF]?'
+MEDIA_MSGS = ['<Multimedia omitido>', '<Media omitted>']
+
+STOPWORDS = dict(
+    es={
+        'a', 'al', 'algo', 'algunas', 'algunos', 'ante', 'antes', 'aca', 'acá', 'ahi', 'ahí', 'alla', 'allá',
+        'aqui', 'aquí', 'asi', 'así', 'aun', 'aún', 'bien', 'cada', 'casi', 'como', 'cómo', 'con', 'contra',
+        'cual', 'cuál', 'cuando', 'cuándo', 'cuanto', 'de', 'del', 'desde', 'donde', 'dónde', 'durante', 'el',
+        'él', 'ella', 'ellas', 'ellos', 'en', 'entre', 'era', 'eran', 'es', 'esa', 'esas', 'ese', 'eso', 'esos',
+        'esta', 'está', 'estaba', 'estamos', 'estan', 'están', 'estar', 'estas', 'estás', 'este', 'esto',
+        'estos', 'estoy', 'fue', 'fueron', 'ha', 'habia', 'había', 'han', 'has', 'hasta', 'hay', 'he', 'la',
+        'las', 'le', 'les', 'lo', 'los', 'mas', 'más', 'me', 'mi', 'mí', 'mis', 'mucho', 'muy', 'nada', 'ni',
+        'no', 'nos', 'nosotros', 'o', 'os', 'otra', 'otro', 'para', 'pero', 'poco', 'por', 'porque', 'que',
+        'qué', 'quien', 'quién', 'se', 'sea', 'ser', 'si', 'sí', 'sin', 'sobre', 'solo', 'sólo', 'son', 'su',
+        'sus', 'también', 'tambien', 'te', 'ti', 'tiene', 'tengo', 'todo', 'todos', 'tu', 'tú', 'tus', 'un',
+        'una', 'uno', 'unos', 'vos', 'y', 'ya', 'yo',
+    },
+)
+
+
+def read_languages(filename=os.path.join(CURR_DIR, '.locales')):
+    """Returns the languages of the locales the app is deployed with"""
+    with open(filename) as file:
+        return {locale_name.split('_')[0] for locale_name in file.read().split()}
+
+
+LANGUAGES = read_languages()
+
+
+def get_stopwords(languages=LANGUAGES):
+    return set().union(*[STOPWORDS.get(language, set()) for language in languages])
+
+
+def build_word_counts(df, stopwords=None):
+    """
+  Tokenizes every message and counts terms by author and month.
+
+  Parameters
+  ----------
+      df : pandas.DataFrame or pyarrow.Table
+          Dataframe returned by get_df_from_content. Tables are tokenized with pyarrow.
+      stopwords : set
+          Terms to leave out. Defaults to the ones of the deployed locales.
+
+  Returns
+  -------
+      pandas.DataFrame: author, year_month, term and count of every non zero count
+    """
+    stopwords = get_stopwords() if stopwords is None else stopwords
+    if isinstance(df, pa.Table):
+        return arrow_backend.count_terms(df, stopwords, MEDIA_MSGS)
+
+    df = df[~df.msg.isin(MEDIA_MSGS)]
+    tokens = df[['author', 'year_month']].assign(term=df.msg.str.lower().str.findall(TOKEN_REGEX))
+    tokens = tokens.explode('term').dropna(subset=['term'])
+    tokens = tokens[~tokens.term.isin(stopwords)]
+    return tokens.groupby(['author', 'year_month', 'term']).size().rename('count').reset_index()
+
+
+def period_label(period, month_names):
+    if '-' not in period:
+        return period
+    y, m = period.split('-')
+    return f'{y}-{month_names[int(m) - 1]}'
+
+
+def build_top_words(counts, n=20, l='es_ES'):
+    """
+  Precomputes the most used terms for every author and period filter, so
+  showing one is a lookup no matter how long the chat is.
+
+  Parameters
+  ----------
+      counts : pandas.DataFrame
+          Counts returned by build_word_counts.
+      n : int
+          Number of terms kept for each filter.
+      l : str
+          Locale used for month names in period labels.
+
+  Returns
+  -------
+      dict: authors, period options and the top n [term, count] pairs by author and
+      period, where '' stands for every author or the whole chat
+    """
+    locale.setlocale(locale.LC_ALL, l)
+    _, month_names = get_locale_names()
+    counts = counts.assign(year=counts.year_month.str[:4])
+
+    top = {}
+    for author_col in ('author', None):
+        for period_col in ('year_month', 'year', None):
+            keys = [col for col in (author_col, period_col) if col]
+            totals = counts.groupby(keys + ['term'])['count'].sum().reset_index()
+            totals = totals.sort_values(keys + ['count', 'term'], ascending=[True] * len(keys) + [False, True])
+            totals = totals.groupby(keys).head(n) if keys else totals.head(n)
+            authors = totals.author if author_col else [''] * len(totals)
+            periods = totals[period_col] if period_col else [''] * len(totals)
+            for author, period, term, count in zip(authors, periods, totals.term, totals['count']):
+                top.setdefault(author, {}).setdefault(period, []).append([term, int(count)])
+
+    periods = sorted(set(counts.year)) + sorted(set(counts.year_month))
+    return dict(
+        authors=sorted(set(counts.author)),
+        periods=[{'label': period_label(p, month_names), 'value': p} for p in periods],
+        top=top
+    )
+
+
+def save_top_words(top_words, file_location):
+    with open(file_location, 'w') as file:
+        json.dump(top_words, file)
+
+
+def load_top_words(file_location):
+    with open(file_location) as file:
+        return json.load(file)
+
+
+def get_top_words(top_words, author=None, period=None):
+    """
+  Most used terms, optionally for a single author and/or period.
+
+  Parameters
+  ----------
+      top_words : dict
+          Lists returned by build_top_words.
+      author : str
+          Only count this author's messages.
+      period : str
+          A year ('2020') or a year and month ('2020-05').
+
+  Returns
+  -------
+      pandas.Series: counts of the top terms, from most to least used
+    """
+    pairs = top_words['top'].get(author or '', {}).get(period or '', [])
+    return pd.Series([count for _, count in pairs], index=[term for term, _ in pairs], dtype=int)